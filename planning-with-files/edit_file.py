@@ -7,17 +7,174 @@ Usage:
   python edit_file.py <file> append <new_content>
   python edit_file.py <file> delete <start_line> <end_line>
   python edit_file.py <file> show <start_line> <end_line>
+
+Set EDIT_FSYNC=0 to skip fsync when rewriting files.
 """
 import sys
 import os
+import io
+import mmap
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+BUFFER_SIZE = 1 << 17
+SHOW_CHUNK_SIZE = 1 << 16
+FSYNC = os.environ.get('EDIT_FSYNC', '1') != '0'
+
+_deferred_fsync = None
+
+def advise(f, name):
+    advice = getattr(os, name, None)
+    if advice is None:
+        return
+    try:
+        os.posix_fadvise(f.fileno(), 0, 0, advice)
+    except OSError:
+        pass
+
+def fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def rewrite_in_place(target):
+    buf = io.BytesIO()
+    yield buf
+    with open(target, 'r+b') as f, buf.getbuffer() as view:
+        f.write(view)
+        f.truncate()
+        f.flush()
+        if FSYNC and _deferred_fsync is None:
+            os.fsync(f.fileno())
+
+@contextmanager
+def atomic_write(filepath):
+    target = os.path.realpath(filepath)
+    st = os.stat(target)
+    # Fail on files the caller cannot write, as an in-place rewrite would.
+    open(target, 'r+b').close()
+    # Renaming over a hard link would split it, and the temp file needs a
+    # writable directory; rewrite those files in place instead.
+    if st.st_nlink > 1 or not os.access(os.path.dirname(target), os.W_OK):
+        with rewrite_in_place(target) as f:
+            yield f
+    else:
+        directory, name = os.path.split(target)
+        fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb', buffering=BUFFER_SIZE) as f:
+                yield f
+                f.flush()
+                if FSYNC and _deferred_fsync is None:
+                    os.fsync(f.fileno())
+            if hasattr(os, 'chown'):
+                try:
+                    os.chown(tmp, st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+            shutil.copymode(target, tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        if FSYNC and _deferred_fsync is None:
+            fsync_dir(directory)
+    if _deferred_fsync is not None:
+        _deferred_fsync.add(target)
+
+@contextmanager
+def batch_edit():
+    global _deferred_fsync
+    if _deferred_fsync is not None:
+        yield
+        return
+    _deferred_fsync = set()
+    try:
+        yield
+    finally:
+        paths, _deferred_fsync = _deferred_fsync, None
+        if FSYNC:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    os.fsync(f.fileno())
+            for directory in {os.path.dirname(path) for path in paths}:
+                fsync_dir(directory)
+
+def terminate_lines(content):
+    if content and not content.endswith('\n'):
+        content += '\n'
+    return content
+
+def line_offsets(data, count):
+    offsets = [0]
+    pos = 0
+    while len(offsets) <= count:
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            break
+        pos = nl + 1
+        offsets.append(pos)
+    return offsets
 
-def read_file(filepath):
-    with open(filepath, 'r') as f:
-        return f.readlines()
+def copy_range(data, src, dst, offset, count):
+    dst.flush()
+    try:
+        while count > 0:
+            sent = os.sendfile(dst.fileno(), src.fileno(), offset, count)
+            if not sent:
+                break
+            offset += sent
+            count -= sent
+    except (AttributeError, OSError):
+        pass
+    if count > 0:
+        dst.write(data[offset:offset + count])
 
-def write_file(filepath, lines):
-    with open(filepath, 'w') as f:
-        f.writelines(lines)
+def splice_file(filepath, start, end, new_bytes):
+    # The source and its mapping are closed before atomic_write renames or
+    # rewrites the target, since Windows refuses either while they are open.
+    with atomic_write(filepath) as dst, open(filepath, 'rb') as src:
+        size = os.fstat(src.fileno()).st_size
+        advise(src, 'POSIX_FADV_SEQUENTIAL')
+        data = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            offsets = line_offsets(data, end)
+            start_off = offsets[start] if start < len(offsets) else size
+            end_off = offsets[end] if end < len(offsets) else size
+            copy_range(data, src, dst, 0, start_off)
+            dst.write(new_bytes)
+            copy_range(data, src, dst, end_off, size - end_off)
+        finally:
+            if size:
+                data.close()
+
+def show_range(filepath, start, end=None):
+    with open(filepath, 'r', buffering=BUFFER_SIZE, newline='\n') as f:
+        advise(f, 'POSIX_FADV_SEQUENTIAL')
+        out = []
+        size = 0
+        for i, line in enumerate(f, 1):
+            if i < start:
+                continue
+            if end is not None and i > end:
+                break
+            out.append(f"{i:4d}: {line}")
+            size += len(line)
+            if size >= SHOW_CHUNK_SIZE:
+                sys.stdout.write(''.join(out))
+                out.clear()
+                size = 0
+        sys.stdout.write(''.join(out))
 
 def main():
     if len(sys.argv) < 3:
@@ -26,56 +183,41 @@ def main():
     
     filepath = sys.argv[1]
     action = sys.argv[2]
+    args = sys.argv[3:]
+    
+    def content(index):
+        return args[index] if len(args) > index else sys.stdin.read()
     
     if action == "show":
-        lines = read_file(filepath)
-        start = int(sys.argv[3]) - 1 if len(sys.argv) > 3 else 0
-        end = int(sys.argv[4]) if len(sys.argv) > 4 else len(lines)
-        for i, line in enumerate(lines[start:end], start=start+1):
-            print(f"{i:4d}: {line}", end='')
-        return
+        start = int(args[0]) if args else 1
+        end = int(args[1]) if len(args) > 1 else None
+        show_range(filepath, start, end)
     
-    if action == "replace":
-        start = int(sys.argv[3]) - 1
-        end = int(sys.argv[4])
-        new_content = sys.argv[5] if len(sys.argv) > 5 else sys.stdin.read()
-        lines = read_file(filepath)
-        new_lines = new_content.split('\n')
-        if not new_content.endswith('\n'):
-            new_lines = [l + '\n' for l in new_lines[:-1]] + [new_lines[-1] + '\n'] if new_lines[-1] else [l + '\n' for l in new_lines[:-1]]
-        else:
-            new_lines = [l + '\n' for l in new_lines[:-1]]
-        lines = lines[:start] + new_lines + lines[end:]
-        write_file(filepath, lines)
-        print(f"Replaced lines {start+1}-{end} with {len(new_lines)} lines")
-        return
+    elif action == "replace":
+        start, end = int(args[0]) - 1, int(args[1])
+        new_content = terminate_lines(content(2))
+        count = new_content.count('\n')
+        splice_file(filepath, start, end, new_content.encode())
+        print(f"Replaced lines {start+1}-{end} with {count} lines")
     
-    if action == "insert":
-        after_line = int(sys.argv[3])
-        new_content = sys.argv[4] if len(sys.argv) > 4 else sys.stdin.read()
-        lines = read_file(filepath)
-        new_lines = new_content.split('\n')
-        new_lines = [l + '\n' for l in new_lines if l or new_lines.index(l) < len(new_lines)-1]
-        lines = lines[:after_line] + new_lines + lines[after_line:]
-        write_file(filepath, lines)
-        print(f"Inserted {len(new_lines)} lines after line {after_line}")
-        return
+    elif action == "insert":
+        after_line = int(args[0])
+        new_content = terminate_lines(content(1))
+        count = new_content.count('\n')
+        splice_file(filepath, after_line, after_line, new_content.encode())
+        print(f"Inserted {count} lines after line {after_line}")
     
-    if action == "append":
-        new_content = sys.argv[3] if len(sys.argv) > 3 else sys.stdin.read()
-        with open(filepath, 'a') as f:
-            f.write(new_content)
+    elif action == "append":
+        data = memoryview(content(0).encode())
+        with open(filepath, 'ab', buffering=0) as f:
+            while data:
+                data = data[f.write(data):]
         print(f"Appended content to {filepath}")
-        return
     
-    if action == "delete":
-        start = int(sys.argv[3]) - 1
-        end = int(sys.argv[4])
-        lines = read_file(filepath)
-        lines = lines[:start] + lines[end:]
-        write_file(filepath, lines)
+    elif action == "delete":
+        start, end = int(args[0]) - 1, int(args[1])
+        splice_file(filepath, start, end, b'')
         print(f"Deleted lines {start+1}-{end}")
-        return
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Regression tests for edit_file.py.
+Usage:
+  python test_edit_file.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'edit_file.py')
+sys.path.insert(0, HERE)
+
+import edit_file
+
+LINES = b'one\ntwo\nthree\nfour\nfive\n'
+
+
+class EditFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'file.txt')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def run_tool(self, *args, stdin=''):
+        result = subprocess.run(
+            [sys.executable, SCRIPT, self.path] + list(args),
+            input=stdin.encode(), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr.decode())
+        return result.stdout.decode()
+
+    def test_replace_first_middle_last(self):
+        for start, end, expected in [
+            ('1', '1', b'X\ntwo\nthree\nfour\nfive\n'),
+            ('2', '4', b'one\nX\nfive\n'),
+            ('5', '5', b'one\ntwo\nthree\nfour\nX\n'),
+        ]:
+            self.write(LINES)
+            out = self.run_tool('replace', start, end, 'X')
+            self.assertEqual(self.read(), expected)
+            self.assertEqual(out, f"Replaced lines {start}-{end} with 1 lines\n")
+
+    def test_replace_from_stdin(self):
+        self.write(LINES)
+        self.run_tool('replace', '2', '3', stdin='A\nB\n')
+        self.assertEqual(self.read(), b'one\nA\nB\nfour\nfive\n')
+
+    def test_replace_with_empty_content_deletes(self):
+        self.write(LINES)
+        self.run_tool('replace', '2', '3', '')
+        self.assertEqual(self.read(), b'one\nfour\nfive\n')
+
+    def test_insert_first_middle_last(self):
+        for after, expected in [
+            ('0', b'X\none\ntwo\nthree\nfour\nfive\n'),
+            ('2', b'one\ntwo\nX\nthree\nfour\nfive\n'),
+            ('5', b'one\ntwo\nthree\nfour\nfive\nX\n'),
+        ]:
+            self.write(LINES)
+            self.run_tool('insert', after, 'X')
+            self.assertEqual(self.read(), expected)
+
+    def test_insert_keeps_interior_blank_lines_only(self):
+        self.write(LINES)
+        out = self.run_tool('insert', '1', 'A\n\nB\n\n')
+        self.assertEqual(self.read(), b'one\nA\n\nB\n\ntwo\nthree\nfour\nfive\n')
+        self.assertEqual(out, "Inserted 4 lines after line 1\n")
+
+    def test_line_count_ignores_other_line_breaks(self):
+        self.write(LINES)
+        out = self.run_tool('insert', '1', 'p\x0cq')
+        self.assertEqual(out, "Inserted 1 lines after line 1\n")
+        self.assertEqual(self.read(), b'one\np\x0cq\ntwo\nthree\nfour\nfive\n')
+        out = self.run_tool('replace', '2', '2', 'r\rs\x0bt\x1cu\n')
+        self.assertEqual(out, "Replaced lines 2-2 with 1 lines\n")
+
+    def test_delete_first_middle_last(self):
+        for start, end, expected in [
+            ('1', '1', b'two\nthree\nfour\nfive\n'),
+            ('2', '4', b'one\nfive\n'),
+            ('5', '5', b'one\ntwo\nthree\nfour\n'),
+        ]:
+            self.write(LINES)
+            self.run_tool('delete', start, end)
+            self.assertEqual(self.read(), expected)
+
+    def test_range_past_eof(self):
+        self.write(LINES)
+        self.run_tool('delete', '4', '100')
+        self.assertEqual(self.read(), b'one\ntwo\nthree\n')
+        self.run_tool('replace', '10', '20', 'X')
+        self.assertEqual(self.read(), b'one\ntwo\nthree\nX\n')
+        self.run_tool('insert', '50', 'Y')
+        self.assertEqual(self.read(), b'one\ntwo\nthree\nX\nY\n')
+
+    def test_no_trailing_newline(self):
+        self.write(b'a\nb')
+        self.run_tool('replace', '2', '2', 'B')
+        self.assertEqual(self.read(), b'a\nB\n')
+        self.write(b'a\nb')
+        self.run_tool('delete', '2', '2')
+        self.assertEqual(self.read(), b'a\n')
+        self.write(b'a\nb')
+        self.run_tool('insert', '1', 'X')
+        self.assertEqual(self.read(), b'a\nX\nb')
+
+    def test_empty_file(self):
+        self.write(b'')
+        self.run_tool('delete', '1', '1')
+        self.assertEqual(self.read(), b'')
+        self.run_tool('insert', '0', 'X')
+        self.assertEqual(self.read(), b'X\n')
+        self.write(b'')
+        self.run_tool('replace', '1', '1', 'Y')
+        self.assertEqual(self.read(), b'Y\n')
+        self.write(b'')
+        self.assertEqual(self.run_tool('show'), '')
+
+    def test_crlf_preserved_outside_edit(self):
+        self.write(b'a\r\nb\r\nc\r\n')
+        self.run_tool('replace', '2', '2', 'X')
+        self.assertEqual(self.read(), b'a\r\nX\nc\r\n')
+
+    def test_append(self):
+        self.write(b'a\n')
+        self.run_tool('append', 'b\nc')
+        self.assertEqual(self.read(), b'a\nb\nc')
+
+    def test_show(self):
+        self.write(LINES)
+        self.assertEqual(self.run_tool('show', '2', '3'), '   2: two\n   3: three\n')
+        self.assertEqual(self.run_tool('show', '4'), '   4: four\n   5: five\n')
+        self.assertEqual(self.run_tool('show', '0', '1'), '   1: one\n')
+        self.assertEqual(len(self.run_tool('show').splitlines()), 5)
+
+    def test_show_and_edit_agree_on_line_numbers(self):
+        self.write(b'a\rb\nc\nd\n')
+        self.assertEqual(self.run_tool('show', '2', '2'), '   2: c\n')
+        self.run_tool('delete', '2', '2')
+        self.assertEqual(self.read(), b'a\rb\nd\n')
+
+    def test_show_large_range(self):
+        self.write(b''.join(b'%d\n' % i for i in range(1, 50001)))
+        lines = self.run_tool('show').splitlines()
+        self.assertEqual(len(lines), 50000)
+        self.assertEqual(lines[-1], '50000: 50000')
+
+    def test_sendfile_unavailable(self):
+        data = b''.join(b'line %d\n' % i for i in range(100000))
+        expected = data.replace(b'line 10\n', b'X\n', 1)
+        for failure in (OSError(22, 'Invalid argument'), AttributeError('sendfile')):
+            self.write(data)
+            with mock.patch('os.sendfile', side_effect=failure, create=True):
+                edit_file.splice_file(self.path, 10, 11, b'X\n')
+            self.assertEqual(self.read(), expected)
+
+    def test_sendfile_partial_then_fallback(self):
+        data = b''.join(b'line %d\n' % i for i in range(1000))
+        real_sendfile = os.sendfile
+        calls = []
+
+        def flaky_sendfile(out_fd, in_fd, offset, count):
+            calls.append(count)
+            if len(calls) > 1:
+                raise OSError(22, 'Invalid argument')
+            return real_sendfile(out_fd, in_fd, offset, min(count, 100))
+
+        self.write(data)
+        with mock.patch('os.sendfile', side_effect=flaky_sendfile):
+            edit_file.splice_file(self.path, 500, 501, b'X\n')
+        self.assertEqual(self.read(), data.replace(b'line 500\n', b'X\n', 1))
+
+    def test_batch_edit_defers_fsync(self):
+        self.write(LINES)
+        real_fsync = os.fsync
+        with mock.patch('os.fsync', side_effect=real_fsync) as fsync:
+            with edit_file.batch_edit():
+                for _ in range(3):
+                    edit_file.splice_file(self.path, 0, 0, b'X\n')
+                self.assertEqual(fsync.call_count, 0)
+            self.assertGreaterEqual(fsync.call_count, 1)
+            self.assertLessEqual(fsync.call_count, 2)
+        self.assertEqual(self.read(), b'X\nX\nX\n' + LINES)
+
+    def test_metadata_preserved(self):
+        self.write(LINES)
+        os.chmod(self.path, 0o640)
+        link = os.path.join(self.tmpdir.name, 'link.txt')
+        os.symlink('file.txt', link)
+        edit_file.splice_file(link, 0, 1, b'X\n')
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        self.assertEqual(self.read(), b'X\ntwo\nthree\nfour\nfive\n')
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['file.txt', 'link.txt'])
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc')
+    def test_source_closed_before_rename(self):
+        self.write(LINES)
+        real_replace = os.replace
+
+        def checked_replace(src, dst):
+            for fd in os.listdir('/proc/self/fd'):
+                try:
+                    self.assertNotEqual(os.readlink(f'/proc/self/fd/{fd}'), self.path)
+                except FileNotFoundError:
+                    pass
+            with open('/proc/self/maps') as maps:
+                self.assertNotIn(self.path, maps.read())
+            real_replace(src, dst)
+
+        with mock.patch('os.replace', side_effect=checked_replace) as replace:
+            edit_file.splice_file(self.path, 0, 1, b'X\n')
+        self.assertEqual(replace.call_count, 1)
+        self.assertEqual(self.read(), b'X\ntwo\nthree\nfour\nfive\n')
+
+    def test_temp_file_is_private(self):
+        self.write(LINES)
+        os.chmod(self.path, 0o644)
+        with edit_file.atomic_write(self.path) as f:
+            self.assertEqual(os.fstat(f.fileno()).st_mode & 0o777, 0o600)
+            f.write(b'X\n')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+        self.assertEqual(self.read(), b'X\n')
+        self.assertEqual(os.listdir(self.tmpdir.name), ['file.txt'])
+
+    @unittest.skipIf(hasattr(os, 'geteuid') and os.geteuid() == 0, 'root ignores file modes')
+    def test_read_only_file_refused(self):
+        self.write(LINES)
+        os.chmod(self.path, 0o444)
+        with self.assertRaises(PermissionError):
+            edit_file.splice_file(self.path, 0, 1, b'X\n')
+        self.assertEqual(self.read(), LINES)
+        self.assertEqual(os.listdir(self.tmpdir.name), ['file.txt'])
+
+    def test_hard_link_kept(self):
+        self.write(LINES)
+        other = os.path.join(self.tmpdir.name, 'other.txt')
+        os.link(self.path, other)
+        inode = os.stat(self.path).st_ino
+        edit_file.splice_file(self.path, 0, 4, b'X\n')
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(os.stat(self.path).st_nlink, 2)
+        with open(other, 'rb') as f:
+            self.assertEqual(f.read(), b'X\nfive\n')
+
+
+if __name__ == '__main__':
+    unittest.main()